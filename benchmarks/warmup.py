@@ -0,0 +1,50 @@
+""" Сравнение задержки первых запросов для Qiwi(token) и Qiwi(token, warmup=N).
+
+Измеряется создание объекта и первые вызовы: detect_operator
+(qiwi.com) и несколько параллельных balance (edge.qiwi.com)
+
+Запуск::
+
+    $ TOKEN=... NUMBER=... python benchmarks/warmup.py
+"""
+
+import os
+import time
+import statistics
+from concurrent import futures
+
+from qiwi_api import Qiwi
+
+CONNECTIONS = 4
+REPEAT = 5
+
+
+def first_requests(warmup):
+    start = time.monotonic()
+    api = Qiwi(os.environ['TOKEN'], warmup=CONNECTIONS if warmup else 0)
+    init = time.monotonic() - start
+
+    start = time.monotonic()
+    api.detect_operator(os.environ['NUMBER'])
+    with futures.ThreadPoolExecutor(CONNECTIONS) as executor:
+        for _ in executor.map(lambda _: api.balance(), range(CONNECTIONS)):
+            pass
+    calls = time.monotonic() - start
+
+    api.session.close()
+    return init, calls
+
+
+def main():
+    for warmup in (False, True):
+        results = [first_requests(warmup) for _ in range(REPEAT)]
+        init = statistics.median(x[0] for x in results) * 1000
+        calls = statistics.median(x[1] for x in results) * 1000
+
+        print('{}: Qiwi() {:.1f} ms, first calls {:.1f} ms, '
+              'total {:.1f} ms'.format('warm' if warmup else 'cold',
+                                       init, calls, init + calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,9 @@
 from .qiwi_api import Qiwi
 from .enums import Providers
+from .query import HistoryQuery, StatisticsQuery
+from .limiter import Limiter
+from .watcher import Watcher
+from .router import Router
+from .hedging import Hedger
 
 __version__ = '1.1'
@@ -8,3 +8,7 @@ class WrongToken(ApiError):
 
 class PermissionError(ApiError):
     pass
+
+
+class CircuitOpen(ApiError):
+    pass
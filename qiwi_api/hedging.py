@@ -0,0 +1,158 @@
+import time
+import threading
+import collections
+from concurrent import futures
+
+
+class Hedger(object):
+    """ Дублирование медленных GET запросов.
+
+    Если ответ не пришёл за время, равное percentile-процентилю задержки
+    последних window запросов того же семейства методов, отправляется
+    второй такой же запрос и берётся первый полученный ответ.
+    Дублируется не больше max_rate от всех запросов, чтобы не расходовать
+    лимит запросов к API. Запрос, который нельзя продублировать, выполняется
+    в вызывающем потоке; время до дубля отсчитывается от начала запроса.
+
+    :param percentile: Процентиль задержки, после которого отправляется дубль
+    :type percentile: int or float
+
+    :param max_rate: Максимальная доля продублированных запросов
+    :type max_rate: float
+
+    :param min_delay: Минимальная задержка перед дублем в секундах
+    :type min_delay: int or float
+
+    :param window: Число последних запросов для расчёта процентиля
+    :type window: int
+
+    :param workers: Число потоков для дублирующих запросов
+    :type workers: int
+    """
+
+    MIN_SAMPLES = 20  #: Число замеров, до набора которого запросы не дублируются
+
+    __slots__ = ('percentile', 'max_rate', 'min_delay', 'window',
+                 'latencies', 'tokens', 'executor', '_lock')
+
+    def __init__(self, percentile=95, max_rate=0.05, min_delay=0.01,
+                 window=100, workers=16):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.window = window
+
+        self.latencies = {}
+        self.tokens = 0.0
+        self.executor = futures.ThreadPoolExecutor(workers)
+        self._lock = threading.Lock()
+
+    def delay(self, family):
+        """ Задержка перед дублем для семейства методов.
+        None, если замеров пока недостаточно
+
+        :param family: Первая часть url метода, например payment-history
+        :type family: str
+        """
+
+        with self._lock:
+            latencies = sorted(self.latencies.get(family, ()))
+
+        if len(latencies) < self.MIN_SAMPLES:
+            return None
+
+        x = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[x])
+
+    def call(self, family, func):
+        """ Выполнить запрос с дублированием
+
+        :param family: Первая часть url метода
+        :type family: str
+
+        :param func: Функция без аргументов, возвращающая ответ сервера.
+            Может быть вызвана дважды
+        :type func: callable
+        """
+
+        delay = self.delay(family)
+
+        with self._lock:
+            # Каждый запрос даёт max_rate дубля, копим не больше одного
+            self.tokens = min(1.0, self.tokens + self.max_rate)
+
+        if delay is None or not self._take_token():
+            return self._timed(family, func)
+
+        # Первый запрос идёт в отдельном потоке сразу, без очереди пула,
+        # чтобы ожидание в очереди не принималось за медленный ответ
+        first = futures.Future()
+        threading.Thread(
+            target=self._run, args=(first, family, func), daemon=True
+        ).start()
+
+        done, _ = futures.wait([first], delay)
+
+        if done:
+            with self._lock:
+                self.tokens = min(1.0, self.tokens + 1)
+
+            return first.result()
+
+        attempts = [first, self.executor.submit(self._timed, family, func)]
+
+        pending = attempts
+        while True:
+            done, pending = futures.wait(
+                pending, return_when=futures.FIRST_COMPLETED
+            )
+            succeeded = [x for x in done if x.exception() is None]
+
+            if succeeded or not pending:
+                winner = (succeeded or list(done))[0]
+                break
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.add_done_callback(_close)
+
+        return winner.result()
+
+    def shutdown(self):
+        """ Остановить потоки """
+
+        self.executor.shutdown()
+
+    def _take_token(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+
+            self.tokens -= 1
+            return True
+
+    def _run(self, future, family, func):
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            future.set_result(self._timed(family, func))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _timed(self, family, func):
+        start = time.monotonic()
+        res = func()
+
+        with self._lock:
+            if family not in self.latencies:
+                self.latencies[family] = collections.deque(maxlen=self.window)
+
+            self.latencies[family].append(time.monotonic() - start)
+
+        return res
+
+
+def _close(attempt):
+    if not attempt.cancelled() and attempt.exception() is None:
+        attempt.result().close()
@@ -0,0 +1,343 @@
+import time
+import threading
+import collections
+
+from .exceptions import ApiError, CircuitOpen
+
+OVERLOAD_STATUSES = frozenset([423, 429])  #: Коды ответа, означающие перегрузку
+
+
+def is_overloaded(status_code):
+    """ Признак перегрузки сервера по коду ответа
+
+    :param status_code: Код ответа
+    :type status_code: int
+    """
+
+    return status_code in OVERLOAD_STATUSES or status_code >= 500
+
+
+class CircuitBreaker(object):
+    """ Автоматический выключатель.
+
+    После failure_threshold ошибок подряд запросы отклоняются
+    без обращения к API. Через reset_timeout секунд пропускается
+    один пробный запрос: если он успешен, выключатель замыкается.
+
+    :param failure_threshold: Число ошибок подряд до размыкания
+    :type failure_threshold: int
+
+    :param reset_timeout: Время в секундах до пробного запроса
+    :type reset_timeout: int or float
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    __slots__ = ('failure_threshold', 'reset_timeout', 'state',
+                 'failures', 'opened_at', '_lock')
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """ Можно ли выполнить запрос """
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and \
+                    time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+
+            return False
+
+    def cancel(self):
+        """ Отменить разрешённый запрос, не выполнив его """
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def success(self):
+        """ Запрос выполнен успешно """
+
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        """ Запрос завершился ошибкой """
+
+        with self._lock:
+            self.failures += 1
+
+            if self.state == self.HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class AdaptiveLimiter(object):
+    """ Адаптивное ограничение числа одновременных запросов (AIMD).
+
+    Пока задержка не превышает минимальную наблюдаемую более чем
+    в tolerance раз, лимит растёт на единицу за окно запросов.
+    При перегрузке лимит умножается на backoff. Минимальная задержка
+    считается по последним window запросам.
+
+    :param initial: Начальный лимит
+    :type initial: int
+
+    :param minimum: Минимальный лимит
+    :type minimum: int
+
+    :param maximum: Максимальный лимит
+    :type maximum: int
+
+    :param backoff: Множитель лимита при перегрузке
+    :type backoff: float
+
+    :param tolerance: Допустимое отношение задержки к минимальной
+    :type tolerance: float
+
+    :param timeout: Максимальное время ожидания свободного места в секундах.
+        None - ждать без ограничения
+    :type timeout: int or float
+
+    :param window: Число последних запросов для расчёта минимальной задержки
+    :type window: int
+    """
+
+    __slots__ = ('limit', 'minimum', 'maximum', 'backoff', 'tolerance',
+                 'timeout', 'in_flight', 'latencies', '_cond')
+
+    def __init__(self, initial=4, minimum=1, maximum=64,
+                 backoff=0.5, tolerance=2.0, timeout=None, window=100):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.timeout = timeout
+
+        self.in_flight = 0
+        self.latencies = collections.deque(maxlen=window)
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """ Занять место под запрос """
+
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self.in_flight < int(self.limit), self.timeout):
+                raise ApiError('Concurrency limit exceeded')
+
+            self.in_flight += 1
+
+    def release(self, latency=None, overloaded=False):
+        """ Освободить место и скорректировать лимит
+
+        :param latency: Время выполнения запроса в секундах
+        :type latency: float
+
+        :param overloaded: Сервер сообщил о перегрузке
+        :type overloaded: bool
+        """
+
+        with self._cond:
+            self.in_flight -= 1
+
+            if overloaded:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+            elif latency is not None:
+                self.latencies.append(latency)
+
+                if latency <= min(self.latencies) * self.tolerance:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            self._cond.notify_all()
+
+
+class RateLimiter(object):
+    """ Ограничение частоты запросов (token bucket).
+
+    :param rate: Число запросов за период
+    :type rate: int
+
+    :param per: Период в секундах
+    :type per: int or float
+    """
+
+    __slots__ = ('rate', 'per', 'tokens', 'updated_at', '_lock')
+
+    def __init__(self, rate=100, per=60):
+        self.rate = rate
+        self.per = per
+
+        self.tokens = float(rate)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.rate,
+            self.tokens + (now - self.updated_at) * self.rate / self.per
+        )
+        self.updated_at = now
+
+    @property
+    def available(self):
+        """ Оставшийся запас запросов """
+
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def delay(self):
+        """ Время в секундах до появления в запасе хотя бы одного запроса """
+
+        with self._lock:
+            self._refill()
+            return self._delay()
+
+    def _delay(self):
+        return max(0.0, (1 - self.tokens) * self.per / self.rate)
+
+    def try_acquire(self):
+        """ Занять запрос без ожидания. Возвращает False, если запас исчерпан """
+
+        with self._lock:
+            self._refill()
+
+            if self.tokens < 1:
+                return False
+
+            self.tokens -= 1
+            return True
+
+    def acquire(self):
+        """ Занять запрос, дождавшись пополнения запаса """
+
+        while True:
+            with self._lock:
+                self._refill()
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                delay = self._delay()
+
+            time.sleep(delay)
+
+
+class Limiter(object):
+    """ Ограничитель конкурентности с автоматическим выключателем
+    для каждого семейства методов API (payment-history, sinap и т.д.)
+
+    Один экземпляр можно передать нескольким объектам :class:`Qiwi`.
+
+    :param initial: Начальный лимит одновременных запросов
+    :type initial: int
+
+    :param minimum: Минимальный лимит
+    :type minimum: int
+
+    :param maximum: Максимальный лимит
+    :type maximum: int
+
+    :param timeout: Максимальное время ожидания свободного места в секундах
+    :type timeout: int or float
+
+    :param failure_threshold: Число ошибок подряд до размыкания выключателя
+    :type failure_threshold: int
+
+    :param reset_timeout: Время в секундах до пробного запроса
+    :type reset_timeout: int or float
+    """
+
+    __slots__ = ('initial', 'minimum', 'maximum', 'timeout',
+                 'failure_threshold', 'reset_timeout', 'endpoints', '_lock')
+
+    def __init__(self, initial=4, minimum=1, maximum=64, timeout=None,
+                 failure_threshold=5, reset_timeout=30):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def get(self, family):
+        """ Ограничитель и выключатель семейства методов
+
+        :param family: Первая часть url метода, например payment-history
+        :type family: str
+        """
+
+        with self._lock:
+            if family not in self.endpoints:
+                self.endpoints[family] = (
+                    AdaptiveLimiter(self.initial, self.minimum,
+                                    self.maximum, timeout=self.timeout),
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+
+            return self.endpoints[family]
+
+    def call(self, family, func):
+        """ Выполнить запрос с учётом ограничений
+
+        :param family: Первая часть url метода
+        :type family: str
+
+        :param func: Функция без аргументов, возвращающая ответ сервера
+        :type func: callable
+        """
+
+        limiter, breaker = self.get(family)
+
+        if not breaker.allow():
+            raise CircuitOpen('Endpoint {} is unavailable'.format(family))
+
+        try:
+            limiter.acquire()
+        except ApiError:
+            breaker.cancel()
+            raise
+
+        start = time.monotonic()
+        try:
+            res = func()
+        except Exception:
+            limiter.release(overloaded=True)
+            breaker.failure()
+            raise
+
+        if res.status_code >= 500:
+            limiter.release(overloaded=True)
+            breaker.failure()
+        elif is_overloaded(res.status_code):
+            # 423 - исчерпан лимит токена, а не сбой метода: другие
+            # кошельки, использующие этот же ограничитель, не блокируем
+            limiter.release(overloaded=True)
+            breaker.success()
+        else:
+            limiter.release(time.monotonic() - start)
+            breaker.success()
+
+        return res
@@ -1,12 +1,39 @@
 import json
+import warnings
 import datetime
 import collections
+from concurrent import futures
 
 import requests
-
-from .enums import OPERATIONS, SOURCES, BLOCKABLE_FIELDS, Providers
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+from .enums import BLOCKABLE_FIELDS, Providers
+from .query import HistoryQuery, StatisticsQuery, format_date
 from .exceptions import ApiError, WrongToken, PermissionError
 
+# requests и httpx распаковывают br только при установленном brotli
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+
+HOSTS = ('https://edge.qiwi.com/', 'https://qiwi.com/')  #: Хосты API
+
 
 class Qiwi(object):
     """ Класс для работы с Qiwi API
@@ -19,16 +46,39 @@ class Qiwi(object):
 
     :param token: Ключ доступа к api
     :type token: str
+
+    :param limiter: Ограничитель конкурентности запросов к API
+    :type limiter: :class:`Limiter`
+
+    :param http2: Использовать HTTP/2 (нужен пакет httpx[http2]).
+        Все запросы идут через одно соединение. Если httpx не установлен,
+        используется requests
+    :type http2: bool
+
+    :param hedger: Дублирование медленных GET запросов
+    :type hedger: :class:`Hedger`
+
+    :param warmup: Число соединений с каждым хостом, открываемых заранее.
+        Пул сессии расширяется до этого размера. См. :meth:`warmup`
+    :type warmup: int
     """
 
-    __slots__ = ('session', 'number')
+    __slots__ = ('session', 'number', 'limiter', 'hedger')
 
-    def __init__(self, token):
-        self.session = requests.Session()
+    def __init__(self, token, limiter=None, http2=False, hedger=None,
+                 warmup=0):
+        self.limiter = limiter
+        self.hedger = hedger
+
+        self.session = self._create_session(http2, warmup)
         self.session.headers['Accept'] = 'application/json'
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
         self.session.headers['Content-Type'] = 'application/json'
         self.session.headers['Authorization'] = 'Bearer {}'.format(token)
 
+        if warmup:
+            self.warmup(warmup)
+
         self.number = self.get_profile(True, False, False)['authInfo']['personId']
 
     def __str__(self):
@@ -143,31 +193,43 @@ class Qiwi(object):
         :type next_txn_id: int
         """
 
-        if sources is None:
-            sources = []
-        elif not isinstance(sources, list):
-            sources = [sources]
+        query = HistoryQuery(rows, operation, sources, from_date, to_date)
 
-        url = 'payment-history/v2/persons/{}/payments'
-        payload = {
-            'rows': rows,
-            'operation': operation,
-            'startDate': self._format_date(from_date),
-            'endDate': self._format_date(to_date),
-            'nextTxnDate': next_txn_date,
-            'nextTxnId': next_txn_id
-        }
+        return self.fetch(query, next_txn_date, next_txn_id)
+
+    def iter_history(self, rows=10, operation='ALL', sources=None,
+                     from_date=None, to_date=None, next_txn_date=None,
+                     next_txn_id=None, all_pages=False):
+        """ Итератор по транзакциям истории.
+
+        Ответ читается потоком, и транзакции возвращаются по мере получения
+        (нужен пакет ijson, иначе ответ разбирается целиком).
+        Параметры совпадают с :meth:`history`.
 
-        if operation not in OPERATIONS:
-            raise ValueError('Unexpected operation: {}'.format(operation))
+        :param all_pages: Загружать следующие страницы, пока они есть
+        :type all_pages: bool
+        """
+
+        query = HistoryQuery(rows, operation, sources, from_date, to_date)
+        url = query.URL.format(self.number)
 
-        for x, source in enumerate(sources):
-            if source not in SOURCES:
-                raise ValueError('Unexpected source: {}'.format(source))
+        while True:
+            cursor = {}
 
-            payload['sources[{}]'.format(x)] = source
+            res = self._request(
+                url, query.build(next_txn_date, next_txn_id), stream=True
+            )
+            try:
+                for transaction in self._iter_data(res, cursor):
+                    yield transaction
+            finally:
+                res.close()
 
-        return self.method(url.format(self.number), payload)
+            next_txn_id = cursor.get('nextTxnId')
+            next_txn_date = cursor.get('nextTxnDate')
+
+            if not all_pages or next_txn_id is None:
+                return
 
     def statistics(self, from_date, to_date, operation='ALL', sources=None):
         """ Получить статистику транзакций
@@ -189,28 +251,22 @@ class Qiwi(object):
         :type sources: str
         """
 
-        if sources is None:
-            sources = []
-        elif not isinstance(sources, list):
-            sources = [sources]
+        query = StatisticsQuery(from_date, to_date, operation, sources)
 
-        url = 'payment-history/v2/persons/{}/payments/total'
-        payload = {
-            'startDate': self._format_date(from_date),
-            'endDate': self._format_date(to_date),
-            'operation': operation,
-        }
-
-        if operation not in OPERATIONS:
-            raise ValueError('Unexpected operation: {}.'.format(operation))
+        return self.fetch(query)
 
-        for x, source in enumerate(sources):
-            if source not in SOURCES:
-                raise ValueError('Unexpected source: {}'.format(source))
+    def fetch(self, query, *args, **kwargs):
+        """ Выполнить готовый запрос.
+        Остальные параметры передаются в метод build запроса
 
-            payload['sources[{}]'.format(x)] = source
+        :param query: Запрос
+        :type query: :class:`HistoryQuery` or :class:`StatisticsQuery`
+        """
 
-        return self.method(url.format(self.number), payload)
+        return self.method(
+            query.URL.format(self.number),
+            query.build(*args, **kwargs)
+        )
 
     def transaction_info(self, transaction_id):
         """ Получить информацию о транзакции
@@ -420,29 +476,61 @@ class Qiwi(object):
         :type method: str
         """
 
+        return self._request(method_name, payload, method).json()
+
+    def _request(self, method_name, payload=None, method='GET', stream=False):
         url = 'https://edge.qiwi.com/{}'.format(method_name)
 
         if payload is None:
             payload = {}
 
-        if method == 'GET':
-            res = self.session.get(url, params=payload)
-        elif method == 'POST':
-            if isinstance(payload, dict):
-                payload = json.dumps(payload, ensure_ascii=False)
+        if method == 'POST' and isinstance(payload, dict):
+            payload = json.dumps(payload, ensure_ascii=False)
+
+        def send():
+            if method == 'GET':
+                if isinstance(payload, dict):
+                    # httpx, в отличие от requests, передаёт None как пустую строку
+                    params = {k: v for k, v in payload.items() if v is not None}
+                else:
+                    params = payload
+
+                if isinstance(self.session, requests.Session):
+                    return self.session.get(url, params=params, stream=stream)
+
+                request = self.session.build_request('GET', url, params=params)
+                return self.session.send(request, stream=stream)
+            elif method == 'POST':
+                return self.session.post(url, json=payload)
 
-            res = self.session.post(url, json=payload)
+        family = method_name.split('/', 1)[0]
 
+        def call():
+            if self.limiter is None:
+                return send()
+
+            return self.limiter.call(family, send)
+
+        if self.hedger is not None and method == 'GET' and not stream:
+            res = self.hedger.call(family, call)
+        else:
+            res = call()
+
+        error = None
         if res.status_code == 401:
-            raise WrongToken('Wrong token')
+            error = WrongToken('Wrong token')
         elif res.status_code == 403:
-            raise PermissionError('Not enough permissions to access this method')
+            error = PermissionError('Not enough permissions to access this method')
         elif res.status_code == 404:
-            raise ApiError('Wallet or invoice not found')
+            error = ApiError('Wallet or invoice not found')
         elif res.status_code == 423:
-            raise ApiError('Too many requests')
+            error = ApiError('Too many requests')
+
+        if error is not None:
+            res.close()
+            raise error
 
-        return res.json()
+        return res
 
     def detect_operator(self, number):
         """ Узнать id оператора
@@ -464,11 +552,142 @@ class Qiwi(object):
 
         return json['message']
 
-    def _format_date(self, date):
-        if date:
-            return datetime.datetime.strptime(date, '%Y-%m-%d-%z').isoformat()
+    def warmup(self, connections=1):
+        """ Заранее открыть соединения с edge.qiwi.com и qiwi.com,
+        чтобы первые запросы не тратили время на DNS, TCP и TLS.
+
+        Соединения остаются в пуле сессии, уже открытые соединения
+        переиспользуются. Число соединений ограничено размером пула,
+        заданным параметром warmup конструктора (не меньше 10).
+        При HTTP/2 достаточно одного соединения на хост.
+
+        :param connections: Число соединений с каждым хостом
+        :type connections: int
+        """
 
-        return None
+        if not isinstance(self.session, requests.Session):
+            for host in HOSTS:
+                self.session.head(host).close()
+
+            return
+
+        adapter = self.session.get_adapter(HOSTS[0])
+
+        conns = []
+        for host in HOSTS:
+            pool = self._connection_pool(adapter, host)
+            size = min(connections, pool.pool.maxsize) if pool.pool else 0
+            conns.extend((pool, pool._get_conn()) for _ in range(size))
+
+        # Соединения, уже лежащие в пуле, повторно не открываем
+        closed = [conn for _, conn in conns if conn.sock is None]
+
+        try:
+            if closed:
+                with futures.ThreadPoolExecutor(len(closed)) as executor:
+                    for _ in executor.map(lambda conn: conn.connect(), closed):
+                        pass
+        finally:
+            for pool, conn in conns:
+                pool._put_conn(conn)
+
+    def _connection_pool(self, adapter, url):
+        if hasattr(adapter, 'get_connection_with_tls_context'):
+            request = requests.Request('GET', url).prepare()
+            return adapter.get_connection_with_tls_context(
+                request, self.session.verify
+            )
+
+        return adapter.get_connection(url)
+
+    def _iter_data(self, res, cursor):
+        if ijson is None:
+            if not isinstance(res, requests.Response):
+                # Потоковый ответ httpx нужно прочитать перед json()
+                res.read()
+
+            json = res.json()
+
+            if not isinstance(json, dict) or 'data' not in json:
+                raise ApiError('Unexpected response without data')
+
+            cursor['nextTxnId'] = json.get('nextTxnId')
+            cursor['nextTxnDate'] = json.get('nextTxnDate')
+
+            for item in json['data']:
+                yield item
+
+            return
+
+        if isinstance(res, requests.Response):
+            res.raw.decode_content = True
+            body = res.raw
+        else:
+            body = _IteratorReader(res.iter_bytes())
+
+        builder = None
+        has_data = False
+        for prefix, event, value in ijson.parse(body, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+
+                if prefix == 'data.item' and event == 'end_map':
+                    yield builder.value
+                    builder = None
+            elif prefix == 'data.item' and event == 'start_map':
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix == 'data' and event == 'start_array':
+                has_data = True
+            elif prefix in ('nextTxnId', 'nextTxnDate'):
+                cursor[prefix] = value
+
+        if not has_data:
+            raise ApiError('Unexpected response without data')
+
+    def _create_session(self, http2, pool_size=0):
+        if http2:
+            try:
+                if httpx is None:
+                    raise ImportError('httpx')
+
+                return httpx.Client(http2=True, timeout=None)
+            except ImportError:
+                warnings.warn('httpx[http2] is not installed, using HTTP/1.1')
+
+        session = requests.Session()
+
+        if pool_size > DEFAULT_POOLSIZE:
+            session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+
+        return session
+
+    def _format_date(self, date):
+        return format_date(date)
 
     def _transaction_id(self):
         return str(int(datetime.datetime.utcnow().timestamp()) * 1000)
+
+
+class _IteratorReader(object):
+    """ Файлоподобная обёртка над итератором байтов для ijson """
+
+    __slots__ = ('iterator', 'buffer')
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.iterator, None)
+            if chunk is None:
+                break
+
+            self.buffer += chunk
+
+        if size < 0:
+            size = len(self.buffer)
+
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
@@ -0,0 +1,98 @@
+import datetime
+import functools
+
+from .enums import OPERATIONS, SOURCES
+
+_OPERATIONS = frozenset(OPERATIONS)
+_SOURCES = frozenset(SOURCES)
+
+
+@functools.lru_cache(maxsize=256)
+def format_date(date):
+    """ Перевести дату из формата ГГГГ-ММ-ДД-<часовой пояс> в ISO 8601
+
+    :param date: Дата, например 2018-07-28-+0300
+    :type date: str
+    """
+
+    if date:
+        return datetime.datetime.strptime(date, '%Y-%m-%d-%z').isoformat()
+
+    return None
+
+
+def _payload(operation, sources, from_date, to_date):
+    if sources is None:
+        sources = []
+    elif not isinstance(sources, list):
+        sources = [sources]
+
+    if operation not in _OPERATIONS:
+        raise ValueError('Unexpected operation: {}'.format(operation))
+
+    payload = {
+        'operation': operation,
+        'startDate': format_date(from_date),
+        'endDate': format_date(to_date)
+    }
+
+    for x, source in enumerate(sources):
+        if source not in _SOURCES:
+            raise ValueError('Unexpected source: {}'.format(source))
+
+        payload['sources[{}]'.format(x)] = source
+
+    return payload
+
+
+class HistoryQuery(object):
+    """ Готовый запрос истории транзакций.
+
+    Параметры проверяются и кодируются один раз, при вызове
+    меняется только позиция в списке. Запрос можно выполнять
+    на разных кошельках через :meth:`Qiwi.fetch`.
+    Параметры совпадают с :meth:`Qiwi.history`.
+    """
+
+    URL = 'payment-history/v2/persons/{}/payments'
+
+    __slots__ = ('payload',)
+
+    def __init__(self, rows=10, operation='ALL', sources=None,
+                 from_date=None, to_date=None):
+        self.payload = _payload(operation, sources, from_date, to_date)
+        self.payload['rows'] = rows
+
+    def build(self, next_txn_date=None, next_txn_id=None):
+        """ Параметры запроса
+
+        :param next_txn_date: Дата транзакции для отсчета от предыдущего списка
+        :type next_txn_date: str
+
+        :param next_txn_id: Номер транзакции для отсчета от предыдущего списка
+        :type next_txn_id: int
+        """
+
+        payload = self.payload.copy()
+        payload['nextTxnDate'] = next_txn_date
+        payload['nextTxnId'] = next_txn_id
+
+        return payload
+
+
+class StatisticsQuery(object):
+    """ Готовый запрос статистики транзакций.
+    Параметры совпадают с :meth:`Qiwi.statistics`
+    """
+
+    URL = 'payment-history/v2/persons/{}/payments/total'
+
+    __slots__ = ('payload',)
+
+    def __init__(self, from_date, to_date, operation='ALL', sources=None):
+        self.payload = _payload(operation, sources, from_date, to_date)
+
+    def build(self):
+        """ Параметры запроса """
+
+        return self.payload.copy()
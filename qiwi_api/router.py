@@ -0,0 +1,218 @@
+import time
+import heapq
+import bisect
+import threading
+
+from .limiter import RateLimiter
+from .exceptions import ApiError
+
+RUB = 643  #: Код валюты рубля
+
+
+class Router(object):
+    """ Распределение платежей между кошельками.
+
+    Для каждой валюты хранится отсортированный по балансу список кошельков.
+    Платёж уходит с кошелька с наименьшим достаточным балансом, у которого
+    остался запас запросов. Балансы обновляются по ответам :meth:`Qiwi.balance`
+    и после каждого платежа, без дополнительных запросов к API.
+
+    Кошельки с исчерпанным запасом запросов убираются из списка до его
+    пополнения, поэтому выбор кошелька - бинарный поиск, O(log n)
+    амортизированно. Список хранится в обычном list: поиск позиции
+    при обновлении баланса - O(log n), но вставка и удаление сдвигают
+    элементы, O(n). Для сотен и тысяч кошельков это быстрее дерева
+    на чистом Python.
+
+    :param rate: Ограничение запросов на кошелёк за период
+    :type rate: int
+
+    :param per: Период в секундах
+    :type per: int or float
+    """
+
+    __slots__ = ('rate', 'per', 'wallets', 'balances', 'index',
+                 'parked', 'parked_keys', '_lock')
+
+    def __init__(self, rate=100, per=60):
+        self.rate = rate
+        self.per = per
+
+        self.wallets = {}
+        self.balances = {}
+        self.index = {}
+        self.parked = []
+        self.parked_keys = set()
+        self._lock = threading.Lock()
+
+    def add(self, api, refresh=True):
+        """ Добавить кошелёк
+
+        :param api: Кошелёк
+        :type api: :class:`Qiwi`
+
+        :param refresh: Сразу запросить баланс
+        :type refresh: bool
+        """
+
+        with self._lock:
+            self.wallets[api.number] = (api, RateLimiter(self.rate, self.per))
+
+        if refresh:
+            self.refresh(api)
+
+    def refresh(self, api):
+        """ Обновить балансы кошелька через :meth:`Qiwi.balance`
+
+        :param api: Кошелёк
+        :type api: :class:`Qiwi`
+        """
+
+        self.wallets[api.number][1].acquire()
+
+        for account in api.balance():
+            if account['balance']:
+                self.update(
+                    api.number,
+                    account['balance']['amount'],
+                    account['balance']['currency']
+                )
+
+    def update(self, number, amount, currency=RUB):
+        """ Установить баланс кошелька, добавленного через :meth:`add`
+
+        :param number: Номер кошелька
+        :type number: int
+
+        :param amount: Баланс
+        :type amount: int or float
+
+        :param currency: Код валюты
+        :type currency: int
+        """
+
+        with self._lock:
+            if number not in self.wallets:
+                raise ValueError('Unknown wallet: {}'.format(number))
+
+            self._set(number, currency, amount)
+
+    def choose(self, amount, currency=RUB):
+        """ Кошелёк с наименьшим достаточным балансом и запасом запросов
+
+        :param amount: Сумма платежа
+        :type amount: int or float
+
+        :param currency: Код валюты
+        :type currency: int
+        """
+
+        with self._lock:
+            return self._choose(amount, currency)[0]
+
+    def send_qiwi(self, recipient, amount, comment=None):
+        """ Перевод на кошелёк Киви с подходящего кошелька.
+        Возвращает пару (кошелёк, ответ :meth:`Qiwi.send_qiwi`)
+
+        :param recipient: Номер получателя в формате 71234567890
+        :type recipient: str
+
+        :param amount: Сумма в рублях
+        :type amount: int or float
+
+        :param comment: Комментарий
+        :type comment: str
+        """
+
+        return self._send(
+            amount,
+            lambda api: api.send_qiwi(recipient, amount, comment)
+        )
+
+    def send_mobile(self, recipient, amount):
+        """ Оплата мобильной связи с подходящего кошелька.
+        Возвращает пару (кошелёк, ответ :meth:`Qiwi.send_mobile`)
+
+        :param recipient: Номер телефона для пополнения в формате 71234567890
+        :type recipient: str
+
+        :param amount: Сумма в рублях
+        :type amount: int or float
+        """
+
+        return self._send(
+            amount,
+            lambda api: api.send_mobile(recipient, amount)
+        )
+
+    def _send(self, amount, func):
+        with self._lock:
+            api, rate_limiter = self._choose(amount, RUB)
+
+            if not rate_limiter.try_acquire():
+                raise ApiError('Too many requests')
+
+            # Резервируем сумму, чтобы параллельные платежи не ушли с того же баланса
+            balance = self.balances[api.number, RUB]
+            self._set(api.number, RUB, balance - amount)
+
+        try:
+            return api, func(api)
+        except Exception:
+            with self._lock:
+                balance = self.balances[api.number, RUB]
+                self._set(api.number, RUB, balance + amount)
+
+            raise
+
+    def _choose(self, amount, currency):
+        self._unpark()
+
+        index = self.index.get(currency, [])
+        x = bisect.bisect_left(index, (amount,))
+
+        # Каждый кошелёк без запаса убирается из списка один раз
+        # до пополнения, так что цикл не сканирует их повторно
+        while x < len(index):
+            number = index[x][1]
+            api, rate_limiter = self.wallets[number]
+            delay = rate_limiter.delay()
+
+            if not delay:
+                return api, rate_limiter
+
+            self._park(number, currency, time.monotonic() + delay)
+
+        raise ApiError('No wallet with enough balance and request budget')
+
+    def _park(self, number, currency, ready_at):
+        index = self.index[currency]
+        balance = self.balances[number, currency]
+        del index[bisect.bisect_left(index, (balance, number))]
+
+        self.parked_keys.add((number, currency))
+        heapq.heappush(self.parked, (ready_at, number, currency))
+
+    def _unpark(self):
+        now = time.monotonic()
+
+        while self.parked and self.parked[0][0] <= now:
+            _, number, currency = heapq.heappop(self.parked)
+            self.parked_keys.discard((number, currency))
+
+            index = self.index.setdefault(currency, [])
+            bisect.insort(index, (self.balances[number, currency], number))
+
+    def _set(self, number, currency, amount):
+        index = self.index.setdefault(currency, [])
+        key = (number, currency)
+        old = self.balances.get(key)
+        parked = key in self.parked_keys
+
+        if old is not None and not parked:
+            del index[bisect.bisect_left(index, (old, number))]
+
+        self.balances[key] = amount
+
+        if not parked:
+            bisect.insort(index, (amount, number))
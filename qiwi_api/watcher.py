@@ -0,0 +1,253 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+import collections
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .query import HistoryQuery
+from .limiter import RateLimiter
+from .exceptions import ApiError, WrongToken, PermissionError
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых откладывается опрос одного кошелька
+_ERRORS = (ApiError, requests.RequestException, KeyError, ValueError)
+
+if httpx is not None:
+    _ERRORS += (httpx.HTTPError,)
+
+
+class _Wallet(object):
+    __slots__ = ('api', 'last_txn_id', 'interval', 'rate_limiter')
+
+    def __init__(self, api, last_txn_id, interval, rate_limiter):
+        self.api = api
+        self.last_txn_id = last_txn_id
+        self.interval = interval
+        self.rate_limiter = rate_limiter
+
+
+class Watcher(object):
+    """ Отслеживание входящих платежей на нескольких кошельках.
+
+    Кошельки опрашиваются по очереди с приоритетом по времени следующего
+    опроса. Интервал кошелька уменьшается вдвое, когда приходят новые
+    платежи, и растёт в полтора раза, пока их нет. Запрашиваются только
+    транзакции новее последней увиденной.
+
+    Если токен кошелька отозван или у него нет прав на историю,
+    кошелёк удаляется, а :class:`WrongToken` или :class:`PermissionError`
+    выбрасывается из :meth:`poll`. Прочие ошибки записываются в лог,
+    и опрос кошелька откладывается.
+
+    Новые платежи передаются подписчикам (:meth:`subscribe`, :meth:`run`)
+    или через асинхронный итератор::
+
+        async for api, transaction in watcher:
+            ...
+
+    :param min_interval: Минимальный интервал опроса кошелька в секундах
+    :type min_interval: int or float
+
+    :param max_interval: Максимальный интервал опроса кошелька в секундах
+    :type max_interval: int or float
+
+    :param rows: Число транзакций в одном запросе. Максимум - 50
+    :type rows: int
+
+    :param rate: Ограничение запросов истории на кошелёк за минуту
+    :type rate: int
+    """
+
+    __slots__ = ('min_interval', 'max_interval', 'query', 'rate', 'wallets',
+                 'queue', 'callbacks', '_pending', '_counter', '_lock',
+                 '_stop', '_wakeup')
+
+    def __init__(self, min_interval=1, max_interval=60, rows=50, rate=100):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.query = HistoryQuery(rows, 'IN')
+        self.rate = rate
+
+        self.wallets = {}
+        self.queue = []
+        self.callbacks = []
+
+        self._pending = collections.deque()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def add(self, api, last_txn_id=None):
+        """ Добавить кошелёк
+
+        :param api: Кошелёк
+        :type api: :class:`Qiwi`
+
+        :param last_txn_id: Номер последней обработанной транзакции.
+            Если не указан, уведомления начнутся с платежей после первого опроса
+        :type last_txn_id: int
+        """
+
+        wallet = _Wallet(
+            api, last_txn_id, self.min_interval, RateLimiter(self.rate, 60)
+        )
+
+        with self._lock:
+            self.wallets[api.number] = wallet
+            self._schedule(wallet, 0)
+
+        self._wakeup.set()
+
+    def remove(self, api):
+        """ Перестать отслеживать кошелёк
+
+        :param api: Кошелёк
+        :type api: :class:`Qiwi`
+        """
+
+        with self._lock:
+            self.wallets.pop(api.number, None)
+
+    def subscribe(self, callback):
+        """ Подписаться на новые платежи
+
+        :param callback: Функция, принимающая кошелёк и транзакцию
+        :type callback: callable
+        """
+
+        self.callbacks.append(callback)
+
+    def poll(self):
+        """ Дождаться очередного кошелька и опросить его.
+        Возвращает список пар (кошелёк, транзакция) от старых к новым
+        """
+
+        self._wakeup.clear()
+
+        # stop() мог быть вызван до clear(), тогда его сигнал потерян
+        if self._stop.is_set():
+            return []
+
+        with self._lock:
+            if self.queue:
+                delay = max(self.queue[0][0] - time.monotonic(), 0)
+            else:
+                delay = None
+
+        # Ждём срока опроса, нового кошелька или остановки
+        self._wakeup.wait(delay)
+
+        if self._stop.is_set():
+            return []
+
+        with self._lock:
+            if not self.queue or self.queue[0][0] > time.monotonic():
+                return []
+
+            wallet = heapq.heappop(self.queue)[2]
+
+            # Кошелёк удалён или добавлен заново
+            if self.wallets.get(wallet.api.number) is not wallet:
+                return []
+
+        try:
+            transactions = self._fetch(wallet)
+        except (WrongToken, PermissionError):
+            # Повторять бессмысленно: убираем кошелёк и сообщаем вызывающему
+            with self._lock:
+                if self.wallets.get(wallet.api.number) is wallet:
+                    del self.wallets[wallet.api.number]
+
+            raise
+        except _ERRORS:
+            # Кошелёк недоступен, исчерпан лимит или пришёл неожиданный ответ
+            logger.warning('Failed to poll wallet %s', wallet.api.number,
+                           exc_info=True)
+            transactions = []
+            wallet.interval = self.max_interval
+        else:
+            if transactions:
+                wallet.interval = max(self.min_interval, wallet.interval / 2)
+            else:
+                wallet.interval = min(self.max_interval, wallet.interval * 1.5)
+        finally:
+            with self._lock:
+                if self.wallets.get(wallet.api.number) is wallet:
+                    self._schedule(wallet, wallet.interval)
+
+        return [(wallet.api, transaction) for transaction in transactions]
+
+    def run(self):
+        """ Опрашивать кошельки и вызывать подписчиков до вызова :meth:`stop` """
+
+        while not self._stop.is_set():
+            for api, transaction in self.poll():
+                for callback in self.callbacks:
+                    callback(api, transaction)
+
+    def stop(self):
+        """ Остановить опрос """
+
+        self._stop.set()
+        self._wakeup.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_event_loop()
+
+        while not self._pending:
+            if self._stop.is_set():
+                raise StopAsyncIteration
+
+            self._pending.extend(await loop.run_in_executor(None, self.poll))
+
+        return self._pending.popleft()
+
+    def _schedule(self, wallet, delay):
+        due = time.monotonic() + delay
+        heapq.heappush(self.queue, (due, next(self._counter), wallet))
+
+    def _fetch(self, wallet):
+        transactions = []
+        next_txn_id = next_txn_date = None
+
+        while True:
+            wallet.rate_limiter.acquire()
+            page = wallet.api.fetch(self.query, next_txn_date, next_txn_id)
+
+            if wallet.last_txn_id is None:
+                if page['data']:
+                    wallet.last_txn_id = page['data'][0]['txnId']
+                else:
+                    wallet.last_txn_id = 0
+
+                return []
+
+            new = [x for x in page['data'] if x['txnId'] > wallet.last_txn_id]
+            transactions.extend(new)
+
+            next_txn_id = page.get('nextTxnId')
+            next_txn_date = page.get('nextTxnDate')
+
+            if len(new) < len(page['data']) or next_txn_id is None:
+                break
+
+        if transactions:
+            wallet.last_txn_id = transactions[0]['txnId']
+
+        transactions.reverse()
+        return transactions
+
@@ -18,6 +18,10 @@ setup(
     url='https://github.com/helow19274/qiwi_api',
     packages=['qiwi_api'],
     install_requires=['requests'],
+    extras_require={
+        'http2': ['httpx[http2]'],
+        'stream': ['ijson>=3.1', 'brotli']
+    },
 
     classifiers=(
         'License :: OSI Approved :: MIT License',
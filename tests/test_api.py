@@ -114,6 +114,13 @@ class TestApi(unittest.TestCase):
 
         self.assertEqual(res, '42')
 
+    def test_warmup(self):
+        api = Qiwi(os.environ['TOKEN'], warmup=2)
+        self.assertIsInstance(api.balance(), list)
+
+        res = api.detect_operator(os.environ['NUMBER'])
+        self.assertEqual(res, '42')
+
     def test_format_date(self):
         self.assertEqual(
             self.api._format_date('2018-07-28-+0300'),
@@ -0,0 +1,94 @@
+import time
+import unittest
+import itertools
+import threading
+import collections
+
+from qiwi_api.hedging import Hedger
+
+
+class Response(object):
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestHedging(unittest.TestCase):
+    def setUp(self):
+        self.hedger = Hedger(max_rate=1, min_delay=0.01)
+
+        for _ in range(Hedger.MIN_SAMPLES):
+            self.hedger.call('sinap', lambda: Response(0))
+
+    def tearDown(self):
+        self.hedger.shutdown()
+
+    def test_delay(self):
+        self.assertIsNone(self.hedger.delay('payment-history'))
+        self.assertEqual(self.hedger.delay('sinap'), 0.01)
+
+    def test_hedge(self):
+        counter = itertools.count()
+        responses = []
+
+        def func():
+            number = next(counter)
+            if number == 0:
+                time.sleep(0.2)
+
+            responses.append(Response(number))
+            return responses[-1]
+
+        res = self.hedger.call('sinap', func)
+        self.assertEqual(res.number, 1)
+
+        time.sleep(0.3)
+        self.assertFalse(res.closed)
+        self.assertTrue([x for x in responses if x.number == 0][0].closed)
+
+    def test_busy_pool(self):
+        hedger = Hedger(max_rate=1, workers=2)
+        hedger.latencies['sinap'] = collections.deque(
+            [0.1] * Hedger.MIN_SAMPLES
+        )
+        calls = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.05)
+            return Response(0)
+
+        def caller():
+            for _ in range(10):
+                hedger.call('sinap', func)
+
+        threads = [threading.Thread(target=caller) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        hedger.shutdown()
+        self.assertEqual(len(calls), 60)
+
+    def test_max_rate(self):
+        hedger = Hedger(max_rate=0)
+        calls = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.001)
+            return Response(0)
+
+        for _ in range(Hedger.MIN_SAMPLES + 5):
+            hedger.call('sinap', func)
+
+        hedger.shutdown()
+        self.assertEqual(len(calls), Hedger.MIN_SAMPLES + 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from qiwi_api.limiter import AdaptiveLimiter, CircuitBreaker, Limiter
+from qiwi_api.exceptions import ApiError, CircuitOpen
+
+
+class Response(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TestLimiter(unittest.TestCase):
+    def test_adaptive_limiter(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=3)
+
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release(0.1)
+
+        self.assertEqual(limiter.limit, 3)
+
+        limiter.acquire()
+        limiter.release(overloaded=True)
+        self.assertEqual(limiter.limit, 1.5)
+
+    def test_latency_window(self):
+        limiter = AdaptiveLimiter(initial=2, window=10)
+
+        limiter.acquire()
+        limiter.release(0.1)
+        limit = limiter.limit
+
+        # Пока быстрый замер в окне, медленные запросы лимит не поднимают
+        for _ in range(9):
+            limiter.acquire()
+            limiter.release(0.3)
+
+        self.assertEqual(limiter.limit, limit)
+        self.assertEqual(len(limiter.latencies), 10)
+
+    def test_acquire_timeout(self):
+        limiter = AdaptiveLimiter(initial=1, timeout=0)
+        limiter.acquire()
+
+        with self.assertRaises(ApiError):
+            limiter.acquire()
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+
+        breaker.failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_call(self):
+        limiter = Limiter(failure_threshold=1, reset_timeout=60)
+
+        res = limiter.call('sinap', lambda: Response(200))
+        self.assertEqual(res.status_code, 200)
+
+        limiter.call('sinap', lambda: Response(423))
+        res = limiter.call('sinap', lambda: Response(200))
+        self.assertEqual(res.status_code, 200)
+
+        limiter.call('sinap', lambda: Response(502))
+
+        with self.assertRaises(CircuitOpen):
+            limiter.call('sinap', lambda: Response(200))
+
+        res = limiter.call('payment-history', lambda: Response(200))
+        self.assertEqual(res.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
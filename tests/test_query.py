@@ -0,0 +1,51 @@
+import unittest
+
+from qiwi_api.query import HistoryQuery, StatisticsQuery, format_date
+
+
+class TestQuery(unittest.TestCase):
+    def test_history_query(self):
+        query = HistoryQuery(5, 'IN', ['QW_RUB', 'CARD'], '2018-07-26-+0300')
+
+        self.assertEqual(query.build(), {
+            'rows': 5,
+            'operation': 'IN',
+            'startDate': '2018-07-26T00:00:00+03:00',
+            'endDate': None,
+            'sources[0]': 'QW_RUB',
+            'sources[1]': 'CARD',
+            'nextTxnDate': None,
+            'nextTxnId': None
+        })
+
+        payload = query.build('2018-07-27T00:00:00+03:00', 123)
+        self.assertEqual(payload['nextTxnId'], 123)
+        self.assertIsNone(query.payload.get('nextTxnId'))
+
+        with self.assertRaises(ValueError):
+            HistoryQuery(operation='wrong')
+
+        with self.assertRaises(ValueError):
+            HistoryQuery(sources='wrong')
+
+    def test_statistics_query(self):
+        query = StatisticsQuery('2018-07-26-+0300', '2018-07-28-+0300',
+                                sources='MK')
+
+        self.assertEqual(query.build(), {
+            'operation': 'ALL',
+            'startDate': '2018-07-26T00:00:00+03:00',
+            'endDate': '2018-07-28T00:00:00+03:00',
+            'sources[0]': 'MK'
+        })
+
+    def test_format_date(self):
+        self.assertEqual(
+            format_date('2018-07-28-+0300'),
+            '2018-07-28T00:00:00+03:00'
+        )
+        self.assertIsNone(format_date(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
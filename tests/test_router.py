@@ -0,0 +1,93 @@
+import time
+import unittest
+
+from qiwi_api.router import Router
+from qiwi_api.exceptions import ApiError
+
+
+class Wallet(object):
+    def __init__(self, number, amount):
+        self.number = number
+        self.amount = amount
+        self.sent = []
+
+    def balance(self):
+        return [
+            {'alias': 'qw_wallet_rub',
+             'balance': {'amount': self.amount, 'currency': 643}},
+            {'alias': 'qw_wallet_usd', 'balance': None}
+        ]
+
+    def send_qiwi(self, recipient, amount, comment=None):
+        if recipient == 'wrong':
+            raise ApiError('Wrong recipient')
+
+        self.sent.append(amount)
+        return {'id': '1'}
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = Router()
+        self.wallets = [Wallet(1, 100), Wallet(2, 50), Wallet(3, 500)]
+
+        for wallet in self.wallets:
+            self.router.add(wallet)
+
+    def test_choose(self):
+        self.assertIs(self.router.choose(10), self.wallets[1])
+        self.assertIs(self.router.choose(60), self.wallets[0])
+        self.assertIs(self.router.choose(500), self.wallets[2])
+
+        with self.assertRaises(ApiError):
+            self.router.choose(501)
+
+    def test_send_qiwi(self):
+        api, res = self.router.send_qiwi('79000000000', 40)
+        self.assertIs(api, self.wallets[1])
+        self.assertEqual(self.router.balances[2, 643], 10)
+
+        with self.assertRaises(ApiError):
+            self.router.send_qiwi('wrong', 40)
+
+        self.assertEqual(self.router.balances[1, 643], 100)
+
+    def test_rate(self):
+        router = Router(rate=2)
+        wallet = Wallet(1, 100)
+        router.add(wallet)
+        router.send_qiwi('79000000000', 1)
+
+        with self.assertRaises(ApiError):
+            router.send_qiwi('79000000000', 1)
+
+    def test_parked(self):
+        router = Router(rate=1, per=0.05)
+        wallets = [Wallet(1, 100), Wallet(2, 200)]
+
+        for wallet in wallets:
+            router.add(wallet, refresh=False)
+            router.update(wallet.number, wallet.amount)
+
+        api, _ = router.send_qiwi('79000000000', 10)
+        self.assertIs(api, wallets[0])
+
+        self.assertIs(router.choose(10), wallets[1])
+        self.assertEqual(router.index[643], [(200, 2)])
+
+        router.update(1, 150)
+        self.assertEqual(router.index[643], [(200, 2)])
+
+        time.sleep(0.06)
+        self.assertIs(router.choose(10), wallets[0])
+        self.assertEqual(router.index[643], [(150, 1), (200, 2)])
+
+    def test_unknown_wallet(self):
+        with self.assertRaises(ValueError):
+            self.router.update(5, 100)
+
+        self.assertIs(self.router.choose(10), self.wallets[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from qiwi_api import Qiwi
+from qiwi_api.qiwi_api import _IteratorReader, ijson
+from qiwi_api.exceptions import ApiError
+
+PAGE = {
+    'data': [
+        {'txnId': 2, 'sum': {'amount': 1.5, 'currency': 643}},
+        {'txnId': 1, 'sum': {'amount': 10, 'currency': 643}}
+    ],
+    'nextTxnId': 1,
+    'nextTxnDate': '2018-07-28T00:00:00+03:00'
+}
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.api = Qiwi.__new__(Qiwi)
+        self.api.session = requests.Session()
+        self.body = json.dumps(PAGE).encode()
+
+    def test_iter_data(self):
+        res = requests.Response()
+        res.raw = io.BytesIO(self.body)
+        cursor = {}
+
+        items = list(self.api._iter_data(res, cursor))
+
+        self.assertEqual(items, PAGE['data'])
+        self.assertEqual(cursor['nextTxnId'], 1)
+        self.assertEqual(cursor['nextTxnDate'], PAGE['nextTxnDate'])
+
+    def test_missing_data(self):
+        for parser in (ijson, None):
+            res = requests.Response()
+            res.raw = io.BytesIO(b'{"message": "error"}')
+
+            with mock.patch('qiwi_api.qiwi_api.ijson', parser):
+                with self.assertRaises(ApiError):
+                    list(self.api._iter_data(res, {}))
+
+    def test_iterator_reader(self):
+        chunks = iter([self.body[:7], self.body[7:30], self.body[30:]])
+        reader = _IteratorReader(chunks)
+
+        self.assertEqual(reader.read(5), self.body[:5])
+        self.assertEqual(reader.read(), self.body[5:])
+        self.assertEqual(reader.read(), b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import json
+import socket
+import unittest
+import functools
+from unittest import mock
+
+import requests
+from urllib3.connection import HTTPSConnection
+
+from qiwi_api import Qiwi
+from qiwi_api.qiwi_api import ijson
+from qiwi_api.exceptions import ApiError, WrongToken
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+PAGE = {
+    'data': [{'txnId': 2}, {'txnId': 1}],
+    'nextTxnId': None,
+    'nextTxnDate': None
+}
+
+
+@unittest.skipIf(httpx is None, 'httpx is not installed')
+class TestHttpx(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+
+        self.api = Qiwi.__new__(Qiwi)
+        self.api.number = 79000000000
+        self.api.limiter = None
+        self.api.hedger = None
+        self.api.session = httpx.Client(
+            transport=httpx.MockTransport(self.handler)
+        )
+
+    def tearDown(self):
+        self.api.session.close()
+
+    def handler(self, request):
+        self.requests.append(request)
+
+        if request.url.path.startswith('/person-profile'):
+            return httpx.Response(
+                200, json={'authInfo': {'personId': 79000000000}}
+            )
+        elif request.url.path == '/mobile/detect.action':
+            return httpx.Response(
+                200, json={'code': {'value': '0'}, 'message': '42'}
+            )
+        elif request.url.path.endswith('/unauthorized'):
+            return httpx.Response(401)
+        elif request.url.path.endswith('/error'):
+            return httpx.Response(500, json={'message': 'error'})
+        elif request.method == 'POST':
+            return httpx.Response(200, json={'id': '1'})
+
+        return httpx.Response(200, json=PAGE)
+
+    def test_init(self):
+        client = functools.partial(
+            httpx.Client, transport=httpx.MockTransport(self.handler)
+        )
+
+        with mock.patch.object(httpx, 'Client', client):
+            api = Qiwi('token', http2=True)
+
+        self.assertIsInstance(api.session, httpx.Client)
+        self.assertEqual(api.number, 79000000000)
+        self.assertEqual(
+            self.requests[0].headers['Authorization'], 'Bearer token'
+        )
+
+    def test_fallback(self):
+        def client(*args, **kwargs):
+            raise ImportError('h2')
+
+        with mock.patch.object(httpx, 'Client', client):
+            with self.assertWarns(UserWarning):
+                session = self.api._create_session(True)
+
+        self.assertIsInstance(session, requests.Session)
+        session.close()
+
+        with mock.patch('qiwi_api.qiwi_api.httpx', None):
+            with self.assertWarns(UserWarning):
+                session = self.api._create_session(True)
+
+        self.assertIsInstance(session, requests.Session)
+        session.close()
+
+    def test_none_params(self):
+        self.api.history(rows=2, next_txn_id=5)
+        params = self.requests[0].url.params
+
+        self.assertEqual(params['nextTxnId'], '5')
+        self.assertNotIn('nextTxnDate', params)
+        self.assertNotIn('startDate', params)
+
+    def test_detect_operator(self):
+        self.assertEqual(self.api.detect_operator('79000000000'), '42')
+
+        request = self.requests[0]
+        self.assertEqual(request.url.host, 'qiwi.com')
+        self.assertEqual(request.content, b'phone=79000000000')
+
+    def test_history(self):
+        res = self.api.history(rows=2, operation='IN')
+
+        self.assertEqual(res, PAGE)
+        self.assertEqual(self.requests[0].url.params['rows'], '2')
+
+    def test_iter_history(self):
+        res = list(self.api.iter_history(rows=2))
+        self.assertEqual(res, PAGE['data'])
+
+    def test_iter_history_streamed(self):
+        class Stream(httpx.SyncByteStream):
+            def __iter__(self):
+                body = json.dumps(PAGE).encode()
+                yield body[:10]
+                yield body[10:]
+
+        self.api.session = httpx.Client(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, stream=Stream())
+        ))
+
+        for parser in (ijson, None):
+            with mock.patch('qiwi_api.qiwi_api.ijson', parser):
+                res = list(self.api.iter_history(rows=2))
+
+            self.assertEqual(res, PAGE['data'])
+
+    def test_post(self):
+        res = self.api.send_qiwi('79000000001', 1)
+
+        self.assertEqual(res, {'id': '1'})
+        self.assertEqual(self.requests[0].method, 'POST')
+
+    def test_errors(self):
+        with self.assertRaises(WrongToken):
+            self.api.method('unauthorized')
+
+        with self.assertRaises(ApiError):
+            next(self.api._iter_data(self.api._request('error'), {}))
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.api = Qiwi.__new__(Qiwi)
+        self.api.session = self.api._create_session(False, 20)
+        self.connected = []
+        self.peers = []
+
+    def tearDown(self):
+        self.api.session.close()
+
+        for peer in self.peers:
+            peer.close()
+
+    def connect(self, conn):
+        conn.sock, peer = socket.socketpair()
+        self.connected.append(conn)
+        self.peers.append(peer)
+
+    def test_warmup(self):
+        adapter = self.api.session.get_adapter('https://edge.qiwi.com/')
+
+        with mock.patch.object(HTTPSConnection, 'connect', autospec=True,
+                               side_effect=self.connect):
+            self.api.warmup(3)
+            self.api.warmup(3)
+
+        self.assertEqual(len(self.connected), 6)
+        self.assertIs(
+            self.api.session.get_adapter('https://edge.qiwi.com/'), adapter
+        )
+
+        hosts = {conn.host for conn in self.connected}
+        self.assertEqual(hosts, {'edge.qiwi.com', 'qiwi.com'})
+
+    def test_pool_size(self):
+        with mock.patch.object(HTTPSConnection, 'connect', autospec=True,
+                               side_effect=self.connect):
+            self.api.warmup(50)
+
+        self.assertEqual(len(self.connected), 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import time
+import unittest
+import threading
+
+import requests
+
+from qiwi_api.watcher import Watcher
+from qiwi_api.exceptions import ApiError, WrongToken
+
+
+class Wallet(object):
+    def __init__(self, number, pages):
+        self.number = number
+        self.pages = pages
+
+    def fetch(self, query, next_txn_date, next_txn_id):
+        page = self.pages.pop(0)
+        if isinstance(page, Exception):
+            raise page
+
+        return page
+
+
+def page(*ids, next_txn_id=None):
+    return {
+        'data': [{'txnId': x} for x in ids],
+        'nextTxnId': next_txn_id,
+        'nextTxnDate': None
+    }
+
+
+class TestWatcher(unittest.TestCase):
+    def test_poll(self):
+        wallet = Wallet(1, [
+            page(5, 4),
+            page(5, 4),
+            page(8, 7, next_txn_id=7),
+            page(6, 5)
+        ])
+        watcher = Watcher(min_interval=0, max_interval=0)
+        watcher.add(wallet)
+
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.poll(), [])
+
+        res = watcher.poll()
+        self.assertEqual([x['txnId'] for _, x in res], [6, 7, 8])
+        self.assertIs(res[0][0], wallet)
+
+    def test_interval(self):
+        wallet = Wallet(1, [page(2), page(3), ApiError()])
+        watcher = Watcher(min_interval=0.01, max_interval=10)
+        watcher.add(wallet, last_txn_id=1)
+
+        watcher.poll()
+        self.assertEqual(watcher.wallets[1].interval, 0.01)
+
+        watcher.queue[0] = (0,) + watcher.queue[0][1:]
+        watcher.poll()
+        self.assertEqual(watcher.wallets[1].interval, 0.01)
+
+        watcher.queue[0] = (0,) + watcher.queue[0][1:]
+        watcher.poll()
+        self.assertEqual(watcher.wallets[1].interval, 10)
+
+    def test_transport_error(self):
+        wallet = Wallet(1, [
+            requests.ConnectionError(),
+            {'message': 'unexpected'},
+            page(2)
+        ])
+        watcher = Watcher(min_interval=0, max_interval=0)
+        watcher.add(wallet, last_txn_id=1)
+        received = []
+
+        def callback(api, transaction):
+            received.append(transaction)
+            watcher.stop()
+
+        watcher.subscribe(callback)
+        watcher.run()
+
+        self.assertEqual(received, [{'txnId': 2}])
+
+    def test_logged_error(self):
+        wallet = Wallet(1, [requests.ConnectionError()])
+        watcher = Watcher(min_interval=0, max_interval=10)
+        watcher.add(wallet, last_txn_id=1)
+
+        with self.assertLogs('qiwi_api.watcher', 'WARNING'):
+            self.assertEqual(watcher.poll(), [])
+
+        self.assertEqual(watcher.wallets[1].interval, 10)
+
+    def test_wrong_token(self):
+        wallet = Wallet(1, [WrongToken('Wrong token')])
+        watcher = Watcher(min_interval=0)
+        watcher.add(wallet, last_txn_id=1)
+
+        with self.assertRaises(WrongToken):
+            watcher.poll()
+
+        self.assertEqual(watcher.wallets, {})
+        self.assertEqual(watcher.queue, [])
+
+    def test_code_error(self):
+        wallet = Wallet(1, [TypeError()])
+        watcher = Watcher(min_interval=0)
+        watcher.add(wallet, last_txn_id=1)
+
+        with self.assertRaises(TypeError):
+            watcher.poll()
+
+    def test_wakeup(self):
+        wallet = Wallet(1, [page(2)])
+        watcher = Watcher(min_interval=0, max_interval=60)
+        timer = threading.Timer(0.05, watcher.add, (wallet, 1))
+
+        start = time.monotonic()
+        timer.start()
+        res = watcher.poll()
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(res, [(wallet, {'txnId': 2})])
+
+    def test_stop(self):
+        watcher = Watcher(min_interval=0)
+        threading.Timer(0.05, watcher.stop).start()
+
+        self.assertEqual(watcher.poll(), [])
+
+    def test_stop_before_poll(self):
+        watcher = Watcher()
+        watcher.stop()
+
+        self.assertEqual(watcher.poll(), [])
+
+    def test_remove(self):
+        wallet = Wallet(1, [])
+        watcher = Watcher(min_interval=0)
+        watcher.add(wallet)
+        watcher.remove(wallet)
+
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.queue, [])
+
+
+if __name__ == '__main__':
+    unittest.main()